@@ -3,34 +3,80 @@
 Claude Code Configuration Manager - Manage multiple Claude Code configurations
 """
 
+import io
 import json
+import mmap
 import os
 import argparse
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 import yaml
 
+try:
+    import orjson
+
+    def _dumps(obj: Any, indent: bool = False) -> bytes:
+        # YAML imports can have int/bool keys; stringify them the way json.dumps does
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj: Any, indent: bool = False) -> bytes:
+        return json.dumps(obj, indent=2 if indent else None).encode("utf-8")
+
+    def _loads(data: bytes) -> Any:
+        # json.loads does not accept memoryviews, bytes() is a no-op for plain bytes
+        return json.loads(bytes(data))
+
+# Imported files larger than this are memory-mapped rather than read into memory
+MMAP_THRESHOLD = 1 << 20
+
 
 class ConfigManager:
+    # Environment variable names by config key, shared across exports
+    _env_keys: Dict[str, str] = {}
+    
     def __init__(self, config_dir: Optional[str] = None):
         self.config_dir = Path(config_dir or Path.home() / ".claude_configs")
         self.config_dir.mkdir(exist_ok=True)
         self.active_config_file = self.config_dir / "active.json"
+        self._config_index: Optional[tuple[float, set[str]]] = None
+        self._active_cache: Optional[tuple[float, Optional[str]]] = None
+    
+    def _load_index(self) -> set[str]:
+        """Scan the config directory for available configuration names"""
+        with os.scandir(self.config_dir) as entries:
+            return {
+                entry.name[:-5]
+                for entry in entries
+                if entry.name.endswith(".json") and entry.name != "active.json"
+            }
+    
+    def _index(self) -> set[str]:
+        """Return the configuration index, rescanning only when the config directory changed"""
+        # Creating or deleting a config file (here or in another process) bumps the directory mtime
+        mtime = os.stat(self.config_dir).st_mtime
+        if self._config_index is not None and self._config_index[0] == mtime:
+            return self._config_index[1]
+        names = self._load_index()
+        self._config_index = (mtime, names)
+        return names
     
     def create_config(self, name: str, config: Dict[str, Any]) -> None:
         """Create a new configuration"""
         config_file = self.config_dir / f"{name}.json"
-        with open(config_file, 'w') as f:
-            json.dump(config, f, indent=2)
+        # Serialize first so a config that can't be encoded leaves no empty file behind
+        data = _dumps(config, indent=True)
+        with open(config_file, 'wb') as f:
+            f.write(data)
         print(f"Configuration '{name}' created at {config_file}")
     
     def list_configs(self) -> List[str]:
         """List all available configurations"""
-        configs = []
-        for file in self.config_dir.glob("*.json"):
-            if file.name != "active.json":
-                configs.append(file.stem)
-        return configs
+        return sorted(self._index())
     
     def get_config(self, name: str) -> Dict[str, Any]:
         """Get a specific configuration"""
@@ -38,38 +84,50 @@ class ConfigManager:
         if not config_file.exists():
             raise FileNotFoundError(f"Configuration '{name}' not found")
         
-        with open(config_file, 'r') as f:
-            return json.load(f)
+        with open(config_file, 'rb') as f:
+            return _loads(f.read())
     
     def set_active(self, name: str) -> None:
         """Set the active configuration"""
-        if name not in self.list_configs():
+        if name not in self._index():
             raise ValueError(f"Configuration '{name}' does not exist")
         
-        with open(self.active_config_file, 'w') as f:
-            json.dump({"active": name}, f)
+        with open(self.active_config_file, 'wb') as f:
+            f.write(_dumps({"active": name}))
+        self._active_cache = (os.stat(self.active_config_file).st_mtime, name)
         print(f"Active configuration set to '{name}'")
     
     def get_active(self) -> Optional[str]:
         """Get the active configuration name"""
-        if not self.active_config_file.exists():
+        try:
+            mtime = os.stat(self.active_config_file).st_mtime
+        except FileNotFoundError:
+            self._active_cache = None
             return None
         
-        with open(self.active_config_file, 'r') as f:
-            return json.load(f).get("active")
+        if self._active_cache is not None and self._active_cache[0] == mtime:
+            return self._active_cache[1]
+        
+        with open(self.active_config_file, 'rb') as f:
+            active = _loads(f.read()).get("active")
+        self._active_cache = (mtime, active)
+        return active
     
     def delete_config(self, name: str) -> None:
         """Delete a configuration"""
         config_file = self.config_dir / f"{name}.json"
-        if not config_file.exists():
-            raise FileNotFoundError(f"Configuration '{name}' not found")
-        
-        config_file.unlink()
+        try:
+            config_file.unlink()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Configuration '{name}' not found") from None
         
         # If this was the active config, clear it
         if self.get_active() == name:
-            if self.active_config_file.exists():
-                self.active_config_file.unlink()
+            try:
+                os.unlink(self.active_config_file)
+            except FileNotFoundError:
+                pass
+            self._active_cache = None
         
         print(f"Configuration '{name}' deleted")
     
@@ -80,30 +138,42 @@ class ConfigManager:
         if format.lower() == "yaml":
             return yaml.dump(config, default_flow_style=False)
         elif format.lower() == "env":
-            env_vars = []
+            buf = io.StringIO()
             for key, value in config.items():
-                env_key = f"CLAUDE_{key.upper()}"
+                env_key = self._env_keys.get(key)
+                if env_key is None:
+                    env_key = self._env_keys[key] = f"CLAUDE_{key.upper()}"
                 if isinstance(value, list):
-                    env_vars.append(f"{env_key}={','.join(map(str, value))}")
-                else:
-                    env_vars.append(f"{env_key}={value}")
-            return "\n".join(env_vars)
+                    value = ','.join(map(str, value))
+                buf.write(f"{env_key}={value}\n")
+            # Drop the trailing newline after the last variable
+            return buf.getvalue()[:-1]
         else:
-            return json.dumps(config, indent=2)
+            return _dumps(config, indent=True).decode("utf-8")
     
     def import_config(self, name: str, file_path: str) -> None:
         """Import a configuration from a file"""
-        file_path = Path(file_path)
-        
-        if file_path.suffix.lower() == ".yaml" or file_path.suffix.lower() == ".yml":
-            with open(file_path, 'r') as f:
-                config = yaml.safe_load(f)
-        elif file_path.suffix.lower() == ".json":
-            with open(file_path, 'r') as f:
-                config = json.load(f)
+        lower = file_path.lower()
+        if lower.endswith((".yaml", ".yml")):
+            is_yaml = True
+        elif lower.endswith(".json"):
+            is_yaml = False
         else:
             raise ValueError("Unsupported file format. Use JSON or YAML.")
         
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size > MMAP_THRESHOLD:
+                # Map large files so the kernel pages them in on demand instead of copying them up front
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if is_yaml:
+                        config = yaml.safe_load(mm)
+                    else:
+                        with memoryview(mm) as view:
+                            config = _loads(view)
+            else:
+                data = f.read()
+                config = yaml.safe_load(data) if is_yaml else _loads(data)
+        
         self.create_config(name, config)
     
     def show_config(self, name: str) -> None:
@@ -116,31 +186,36 @@ class ConfigManager:
 
 def create_default_configs(manager: ConfigManager) -> None:
     """Create some default configurations"""
+    cwd = str(Path.cwd())
     configs = {
         "development": {
             "max_turns": 20,
             "model": "claude-3-5-sonnet-20241022",
             "system_prompt": "You are a helpful coding assistant focused on development tasks.",
             "allowed_tools": ["Read", "Write", "Edit", "Bash", "Glob", "Grep"],
-            "working_directory": str(Path.cwd())
+            "working_directory": cwd
         },
         "production": {
             "max_turns": 5,
             "model": "claude-3-5-sonnet-20241022",
             "system_prompt": "You are a careful assistant focused on production-ready code.",
             "blocked_tools": ["Bash"],
-            "working_directory": str(Path.cwd())
+            "working_directory": cwd
         },
         "analysis": {
             "max_turns": 10,
             "model": "claude-3-5-sonnet-20241022",
             "system_prompt": "You are an expert code analyzer and reviewer.",
             "allowed_tools": ["Read", "Glob", "Grep"],
-            "working_directory": str(Path.cwd())
+            "working_directory": cwd
         }
     }
     
+    existing = set(manager.list_configs())
     for name, config in configs.items():
+        if name in existing:
+            print(f"Skipping {name}: already exists")
+            continue
         try:
             manager.create_config(name, config)
         except Exception as e:
@@ -200,16 +275,16 @@ def main():
     
     try:
         if args.command == "create":
-            config = {
-                "max_turns": args.max_turns,
-                "model": args.model,
-                "system_prompt": args.system_prompt,
-                "allowed_tools": args.allowed_tools,
-                "blocked_tools": args.blocked_tools,
-                "working_directory": args.working_directory or str(Path.cwd())
-            }
-            # Remove None values
-            config = {k: v for k, v in config.items() if v is not None}
+            config = {"max_turns": args.max_turns, "model": args.model}
+            # Only include optional settings that were given
+            for key, value in (
+                ("system_prompt", args.system_prompt),
+                ("allowed_tools", args.allowed_tools),
+                ("blocked_tools", args.blocked_tools),
+            ):
+                if value is not None:
+                    config[key] = value
+            config["working_directory"] = args.working_directory or str(Path.cwd())
             manager.create_config(args.name, config)
         
         elif args.command == "list":
@@ -4,34 +4,104 @@ Claude Code Parallel Task Executor
 Advanced implementation leveraging Claude Code SDK's parallel capabilities
 """
 
+from __future__ import annotations
+
 import asyncio
 import json
 import time
 import argparse
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Callable, Coroutine
-from dataclasses import dataclass, asdict
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Callable, Coroutine
+from dataclasses import dataclass
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import uuid
+from collections import defaultdict
 
-try:
-    import anyio
-    from claude_code_sdk import query, ClaudeCodeOptions
+if TYPE_CHECKING:
     from rich.console import Console
-    from rich.panel import Panel
-    from rich.progress import Progress, TaskID, SpinnerColumn, TextColumn, BarColumn, TimeElapsedColumn
-    from rich.table import Table
-    from rich.live import Live
-    from rich.layout import Layout
-    from rich.text import Text
-    from rich.markdown import Markdown
-except ImportError as e:
-    print(f"Missing dependencies: {e}")
-    print("Install: pip install claude-code-sdk rich anyio")
-    exit(1)
+    from rich.progress import Progress, TaskID
+
+_heavy_loaded = False
+
+
+def _load_heavy() -> None:
+    """Import the Claude Code SDK and rich on first use, keeping them off the CLI startup path"""
+    global _heavy_loaded, query, ClaudeCodeOptions, Console, Progress, TaskID
+    global SpinnerColumn, TextColumn, BarColumn, TimeElapsedColumn, Table
+    if _heavy_loaded:
+        return
+    
+    try:
+        from claude_code_sdk import query, ClaudeCodeOptions
+        from rich.console import Console
+        from rich.progress import Progress, TaskID, SpinnerColumn, TextColumn, BarColumn, TimeElapsedColumn
+        from rich.table import Table
+    except ImportError as e:
+        print(f"Missing dependencies: {e}")
+        print("Install: pip install claude-code-sdk rich anyio")
+        exit(1)
+    _heavy_loaded = True
+
+try:
+    import orjson
+
+    def _dump_results(results: Dict[str, TaskResult]) -> bytes:
+        # orjson serializes dataclasses natively, so no intermediate dicts are built
+        return orjson.dumps(results, option=orjson.OPT_INDENT_2, default=str)
+
+    _loads = orjson.loads
+except ImportError:
+    def _dump_results(results: Dict[str, TaskResult]) -> bytes:
+        # TaskResult only holds primitives, so its slot values are already serializable
+        serializable_results = {
+            task_id: {name: getattr(result, name) for name in TaskResult.__slots__}
+            for task_id, result in results.items()
+        }
+        return json.dumps(serializable_results, indent=2).encode("utf-8")
+
+    _loads = json.loads
+
 
+# Text extractors by SDK message type, and whether a content block type carries text.
+# Both are detected from the first instance seen so later messages skip the hasattr probes.
+_MSG_DISPATCH: Dict[type, Callable[[Any], List[str]]] = {}
+_BLOCK_HAS_TEXT: Dict[type, bool] = {}
 
-@dataclass
+
+def _extract_content(message: Any) -> List[str]:
+    texts = []
+    for block in message.content:
+        has_text = _BLOCK_HAS_TEXT.get(type(block))
+        if has_text is None:
+            has_text = _BLOCK_HAS_TEXT[type(block)] = hasattr(block, 'text')
+        if has_text:
+            texts.append(block.text)
+    return texts
+
+
+def _extract_result(message: Any) -> List[str]:
+    return [str(message.result)]
+
+
+def _extract_nothing(message: Any) -> List[str]:
+    return []
+
+
+def _message_texts(message: Any) -> List[str]:
+    """Return the text fragments carried by a streamed SDK message"""
+    extractor = _MSG_DISPATCH.get(type(message))
+    if extractor is None:
+        if hasattr(message, 'content') and hasattr(message.content, '__iter__'):
+            extractor = _extract_content
+        elif hasattr(message, 'result'):
+            extractor = _extract_result
+        else:
+            extractor = _extract_nothing
+        _MSG_DISPATCH[type(message)] = extractor
+    return extractor(message)
+
+
+@dataclass(slots=True)
 class ParallelTask:
     """Represents a task for parallel execution"""
     id: str
@@ -51,7 +121,7 @@ class ParallelTask:
             self.id = str(uuid.uuid4())[:8]
 
 
-@dataclass
+@dataclass(slots=True)
 class TaskResult:
     """Result of a parallel task execution"""
     task_id: str
@@ -66,15 +136,31 @@ class ParallelTaskExecutor:
     """Execute multiple Claude Code tasks in parallel with sophisticated coordination"""
     
     def __init__(self, max_parallel: int = 10, console: Optional[Console] = None):
+        _load_heavy()
         self.max_parallel = min(max_parallel, 10)  # Claude Code limit
         self.console = console or Console()
         self.completed_tasks: Dict[str, TaskResult] = {}
         self.running_tasks: Dict[str, asyncio.Task] = {}
+    
+    async def _run_with_semaphore(self, task: ParallelTask, semaphore: asyncio.Semaphore, progress: Optional[Progress] = None, task_id: Optional[TaskID] = None) -> TaskResult:
+        """Execute a task under the parallelism limit, converting unexpected errors into a failed result"""
+        try:
+            async with semaphore:
+                return await self.execute_single_task(task, progress, task_id)
+        except Exception as e:
+            return TaskResult(
+                task_id=task.id,
+                success=False,
+                result="",
+                error=str(e),
+                execution_time=0.0
+            )
         
-    async def execute_single_task(self, task: ParallelTask, progress: Progress, task_id: TaskID) -> TaskResult:
-        """Execute a single Claude Code task"""
+    async def execute_single_task(self, task: ParallelTask, progress: Optional[Progress] = None, task_id: Optional[TaskID] = None) -> TaskResult:
+        """Execute a single Claude Code task, reporting status to progress when one is given"""
         start_time = time.time()
-        result_parts = []
+        # Newline-separated UTF-8 text of every streamed block
+        result_buf = bytearray()
         
         try:
             # Create options for this specific task
@@ -89,21 +175,22 @@ class ParallelTaskExecutor:
             if task.tools_blocked:
                 options.blocked_tools = task.tools_blocked
             
-            progress.update(task_id, description=f"[blue]Executing: {task.description}")
+            if progress is not None:
+                progress.start_task(task_id)
+                progress.update(task_id, description=f"[blue]Executing: {task.description}")
             
             # Execute the task using Claude Code SDK
             async for message in query(prompt=task.prompt, options=options):
-                if hasattr(message, 'content') and hasattr(message.content, '__iter__'):
-                    for block in message.content:
-                        if hasattr(block, 'text'):
-                            result_parts.append(block.text)
-                elif hasattr(message, 'result'):
-                    result_parts.append(str(message.result))
+                for text in _message_texts(message):
+                    result_buf += text.encode('utf-8')
+                    result_buf.append(0x0A)
             
             execution_time = time.time() - start_time
-            result = '\n'.join(result_parts)
+            # Drop the separator after the last block
+            result = result_buf[:-1].decode('utf-8')
             
-            progress.update(task_id, description=f"[green]✓ Completed: {task.description}")
+            if progress is not None:
+                progress.update(task_id, description=f"[green]✓ Completed: {task.description}")
             
             return TaskResult(
                 task_id=task.id,
@@ -114,7 +201,8 @@ class ParallelTaskExecutor:
             
         except asyncio.TimeoutError:
             execution_time = time.time() - start_time
-            progress.update(task_id, description=f"[red]⏰ Timeout: {task.description}")
+            if progress is not None:
+                progress.update(task_id, description=f"[red]⏰ Timeout: {task.description}")
             return TaskResult(
                 task_id=task.id,
                 success=False,
@@ -124,7 +212,8 @@ class ParallelTaskExecutor:
             )
         except Exception as e:
             execution_time = time.time() - start_time
-            progress.update(task_id, description=f"[red]✗ Failed: {task.description}")
+            if progress is not None:
+                progress.update(task_id, description=f"[red]✗ Failed: {task.description}")
             return TaskResult(
                 task_id=task.id,
                 success=False,
@@ -139,6 +228,9 @@ class ParallelTaskExecutor:
         # Sort tasks by priority and resolve dependencies
         sorted_tasks = self._resolve_dependencies(tasks)
         
+        # One limit shared by every batch of this call; created here so it belongs to the running loop
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        
         if show_progress:
             with Progress(
                 SpinnerColumn(),
@@ -147,113 +239,85 @@ class ParallelTaskExecutor:
                 TimeElapsedColumn(),
                 console=self.console
             ) as progress:
-                return await self._execute_with_progress(sorted_tasks, progress)
+                return await self._execute_with_progress(sorted_tasks, semaphore, progress)
         else:
-            return await self._execute_without_progress(sorted_tasks)
+            return await self._execute_without_progress(sorted_tasks, semaphore)
     
     def _resolve_dependencies(self, tasks: List[ParallelTask]) -> List[List[ParallelTask]]:
         """Resolve task dependencies and return batches for sequential execution"""
-        task_map = {task.id: task for task in tasks}
-        completed = set()
+        # Kahn's algorithm: each batch is the frontier of tasks whose dependencies have all been scheduled
+        position = {task.id: i for i, task in enumerate(tasks)}
+        indegree = {task.id: len(task.dependencies) for task in tasks}
+        children: Dict[str, List[ParallelTask]] = defaultdict(list)
+        for task in tasks:
+            for dep in task.dependencies:
+                children[dep].append(task)
+        
+        ready_tasks = [task for task in tasks if indegree[task.id] == 0]
+        scheduled = 0
         batches = []
         
-        while len(completed) < len(tasks):
-            # Find tasks that can run (all dependencies completed)
-            ready_tasks = []
-            for task in tasks:
-                if task.id not in completed:
-                    if all(dep in completed for dep in task.dependencies):
-                        ready_tasks.append(task)
-            
+        while scheduled < len(tasks):
             if not ready_tasks:
                 # Circular dependency or missing dependency
-                remaining = [task for task in tasks if task.id not in completed]
+                remaining = [task for task in tasks if indegree[task.id] > 0]
                 self.console.print(f"[red]Warning: Circular dependency detected. Running remaining {len(remaining)} tasks anyway.[/red]")
                 ready_tasks = remaining
             
-            # Sort by priority within the batch
-            ready_tasks.sort(key=lambda x: x.priority, reverse=True)
+            # Sort by priority within the batch, keeping the input order for ties
+            ready_tasks.sort(key=lambda x: (-x.priority, position[x.id]))
             batches.append(ready_tasks)
-            completed.update(task.id for task in ready_tasks)
+            scheduled += len(ready_tasks)
+            
+            for task in ready_tasks:
+                indegree[task.id] = -1
+            
+            next_ready = []
+            for task in ready_tasks:
+                for child in children.get(task.id, ()):
+                    if indegree[child.id] > 0:
+                        indegree[child.id] -= 1
+                        if indegree[child.id] == 0:
+                            next_ready.append(child)
+            ready_tasks = next_ready
         
         return batches
     
-    async def _execute_with_progress(self, task_batches: List[List[ParallelTask]], progress: Progress) -> Dict[str, TaskResult]:
+    async def _execute_with_progress(self, task_batches: List[List[ParallelTask]], semaphore: asyncio.Semaphore, progress: Progress) -> Dict[str, TaskResult]:
         """Execute task batches with progress tracking"""
         all_results = {}
         
         for batch_idx, batch in enumerate(task_batches):
             self.console.print(f"\n[bold blue]Executing Batch {batch_idx + 1}/{len(task_batches)}[/bold blue]")
             
-            # Create progress tasks for this batch
-            progress_tasks = {}
-            for task in batch:
-                progress_id = progress.add_task(f"Queued: {task.description}", total=1)
-                progress_tasks[task.id] = progress_id
+            # Create progress tasks for this batch; each one is started once its task acquires a slot
+            progress_tasks = {
+                task.id: progress.add_task(f"Queued: {task.description}", total=1, start=False)
+                for task in batch
+            }
             
-            # Execute batch in parallel (up to max_parallel limit)
-            semaphore = asyncio.Semaphore(self.max_parallel)
-            
-            async def run_with_semaphore(task: ParallelTask):
-                async with semaphore:
-                    return await self.execute_single_task(task, progress, progress_tasks[task.id])
-            
-            # Execute all tasks in this batch
-            batch_results = await asyncio.gather(
-                *[run_with_semaphore(task) for task in batch],
-                return_exceptions=True
-            )
-            
-            # Process results
-            for task, result in zip(batch, batch_results):
-                if isinstance(result, Exception):
-                    result = TaskResult(
-                        task_id=task.id,
-                        success=False,
-                        result="",
-                        error=str(result),
-                        execution_time=0.0
-                    )
-                
-                all_results[task.id] = result
-                self.completed_tasks[task.id] = result
-                progress.update(progress_tasks[task.id], completed=1)
+            # Execute batch in parallel (up to max_parallel limit), recording results as they finish
+            for next_result in asyncio.as_completed(
+                [self._run_with_semaphore(task, semaphore, progress, progress_tasks[task.id]) for task in batch]
+            ):
+                result = await next_result
+                all_results[result.task_id] = result
+                self.completed_tasks[result.task_id] = result
+                progress.update(progress_tasks[result.task_id], completed=1)
         
         return all_results
     
-    async def _execute_without_progress(self, task_batches: List[List[ParallelTask]]) -> Dict[str, TaskResult]:
+    async def _execute_without_progress(self, task_batches: List[List[ParallelTask]], semaphore: asyncio.Semaphore) -> Dict[str, TaskResult]:
         """Execute task batches without progress display"""
         all_results = {}
         
         for batch in task_batches:
-            semaphore = asyncio.Semaphore(self.max_parallel)
-            
-            async def run_with_semaphore(task: ParallelTask):
-                async with semaphore:
-                    # Create a dummy progress for the method signature
-                    class DummyProgress:
-                        def update(self, *args, **kwargs):
-                            pass
-                    
-                    return await self.execute_single_task(task, DummyProgress(), None)
-            
-            batch_results = await asyncio.gather(
-                *[run_with_semaphore(task) for task in batch],
-                return_exceptions=True
-            )
-            
-            for task, result in zip(batch, batch_results):
-                if isinstance(result, Exception):
-                    result = TaskResult(
-                        task_id=task.id,
-                        success=False,
-                        result="",
-                        error=str(result),
-                        execution_time=0.0
-                    )
-                
-                all_results[task.id] = result
-                self.completed_tasks[task.id] = result
+            for next_result in asyncio.as_completed(
+                [self._run_with_semaphore(task, semaphore) for task in batch]
+            ):
+                result = await next_result
+                all_results[result.task_id] = result
+                self.completed_tasks[result.task_id] = result
         
         return all_results
     
@@ -380,12 +444,7 @@ class ParallelTaskExecutor:
     
     def save_results(self, results: Dict[str, TaskResult], output_file: Path) -> None:
         """Save results to a JSON file"""
-        serializable_results = {}
-        for task_id, result in results.items():
-            serializable_results[task_id] = asdict(result)
-        
-        with open(output_file, 'w') as f:
-            json.dump(serializable_results, f, indent=2)
+        output_file.write_bytes(_dump_results(results))
         
         self.console.print(f"[green]Results saved to {output_file}[/green]")
 
@@ -416,6 +475,7 @@ async def main():
         parser.print_help()
         return
     
+    _load_heavy()
     console = Console()
     executor = ParallelTaskExecutor(max_parallel=args.max_parallel, console=console)
     
@@ -429,12 +489,7 @@ async def main():
         
     elif args.command == "custom":
         console.print(f"[bold blue]Loading custom tasks from {args.config}[/bold blue]")
-        with open(args.config) as f:
-            task_configs = json.load(f)
-        
-        tasks = []
-        for config in task_configs:
-            tasks.append(ParallelTask(**config))
+        tasks = [ParallelTask(**config) for config in _loads(args.config.read_bytes())]
     
     else:
         console.print("[red]Unknown command[/red]")
@@ -453,4 +508,18 @@ async def main():
 
 
 if __name__ == "__main__":
-    anyio.run(main)
\ No newline at end of file
+    try:
+        import anyio
+    except ImportError as e:
+        print(f"Missing dependencies: {e}")
+        print("Install: pip install claude-code-sdk rich anyio")
+        exit(1)
+    
+    # uvloop is optional; when installed it gives a faster event loop for many streaming tasks.
+    # Only the backend options are chosen inside the try so errors from main() don't chain onto the ImportError
+    try:
+        import uvloop  # noqa: F401
+        backend_options = {"use_uvloop": True}
+    except ImportError:
+        backend_options = {}
+    anyio.run(main, backend_options=backend_options)
\ No newline at end of file
@@ -6,14 +6,16 @@ Claude Code TUI - Terminal User Interface for Claude Code SDK
 import asyncio
 import sys
 import base64
+import functools
 import tempfile
 from pathlib import Path
-from typing import List, Optional
+from collections import deque
+from typing import Deque, List, Optional
 
 try:
     import anyio
     from claude_code_sdk import query, ClaudeCodeOptions
-    from rich.console import Console
+    from rich.console import Console, Group
     from rich.markdown import Markdown
     from rich.panel import Panel
     from rich.prompt import Prompt
@@ -23,24 +25,61 @@ try:
     from rich.layout import Layout
     from rich.align import Align
     import subprocess
-    from PIL import Image
+    from PIL import Image, ImageGrab
     import io
-    import keyboard
 except ImportError as e:
     print(f"Missing dependency: {e}")
-    print("Install with: pip install claude-code-sdk rich pillow keyboard")
+    print("Install with: pip install claude-code-sdk rich pillow")
     sys.exit(1)
 
+# prompt_toolkit is optional; it provides the Ctrl+V paste hotkey, otherwise only the `paste` command reads the clipboard
+try:
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.formatted_text import HTML
+    from prompt_toolkit.key_binding import KeyBindings
+except ImportError:
+    PromptSession = None
+
+# Seconds between redraws of the streaming response (~30 fps)
+LIVE_REFRESH_INTERVAL = 1 / 30
+
+# Maximum number of entries kept in the conversation history
+MAX_HISTORY_ENTRIES = 200
+
 
 class ClaudeTUI:
     def __init__(self):
         self.console = Console()
-        self.conversation_history: List[str] = []
+        # Two entries per turn; the oldest turns are dropped once the limit is reached
+        self.conversation_history: Deque[str] = deque(maxlen=MAX_HISTORY_ENTRIES)
         self.options = ClaudeCodeOptions(
             max_turns=10,
             permission_mode="bypassPermissions"  # Allow all tools including Read
         )
         self.clipboard_paste_pending = False
+        self.prompt_session = self._create_prompt_session()
+    
+    def _create_prompt_session(self):
+        """Create a prompt_toolkit session with the Ctrl+V paste binding, if prompt_toolkit is installed"""
+        if PromptSession is None:
+            return None
+        
+        bindings = KeyBindings()
+        
+        @bindings.add("c-v")
+        def _(event):
+            # Submit the line as typed; it becomes the question asked about the clipboard image
+            self.clipboard_paste_pending = True
+            event.app.exit(result=event.current_buffer.text)
+        
+        return PromptSession(key_bindings=bindings)
+    
+    async def _read_input(self, prefill: str = "") -> str:
+        """Read the next line of user input, starting from prefill where the prompt can edit it"""
+        if self.prompt_session is None:
+            return Prompt.ask("\n[bold green]You[/bold green]", console=self.console)
+        return await self.prompt_session.prompt_async(
+            HTML("\n<ansigreen><b>You</b></ansigreen>: "), default=prefill)
     
     def get_clipboard_image(self) -> Optional[str]:
         """Get image from clipboard and save to temp file"""
@@ -76,36 +115,13 @@ class ClaudeTUI:
                 except (subprocess.CalledProcessError, FileNotFoundError):
                     pass
             
-            elif sys.platform == "darwin":
-                # macOS - use pngpaste
-                try:
+            elif sys.platform in ("darwin", "win32"):
+                # macOS / Windows - Pillow reads the clipboard directly, no external tool needed
+                image = ImageGrab.grabclipboard()
+                if isinstance(image, Image.Image):
                     with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as f:
-                        subprocess.run(["pngpaste", f.name], check=True)
+                        image.save(f, "PNG")
                         return f.name
-                except (subprocess.CalledProcessError, FileNotFoundError):
-                    pass
-            
-            elif sys.platform == "win32":
-                # Windows - use PowerShell
-                try:
-                    ps_script = """
-                    Add-Type -AssemblyName System.Windows.Forms
-                    if ([System.Windows.Forms.Clipboard]::ContainsImage()) {
-                        $image = [System.Windows.Forms.Clipboard]::GetImage()
-                        $image.Save('temp_clipboard.png', [System.Drawing.Imaging.ImageFormat]::Png)
-                        Write-Output 'temp_clipboard.png'
-                    }
-                    """
-                    result = subprocess.run(
-                        ["powershell", "-Command", ps_script],
-                        capture_output=True,
-                        text=True,
-                        check=True
-                    )
-                    if result.stdout.strip() == "temp_clipboard.png":
-                        return "temp_clipboard.png"
-                except (subprocess.CalledProcessError, FileNotFoundError):
-                    pass
             
             return None
         except Exception:
@@ -142,9 +158,9 @@ class ClaudeTUI:
 - Use Ctrl+C to interrupt long responses
 - Claude has access to file system tools
 - For images: `image /path/to/image.png What do you see?`
-- For clipboard: `paste What's in this screenshot?` or **Ctrl+Shift+V**
+- For clipboard: `paste What's in this screenshot?`, or type the question and press **Ctrl+V** (needs prompt_toolkit)
         """
-        self.console.print(Panel(Markdown(help_text), title="Help", border_style="green"))
+        self.console.print(Panel(self._md(help_text), title="Help", border_style="green"))
     
     def display_config(self):
         """Display current configuration"""
@@ -155,34 +171,53 @@ class ClaudeTUI:
 - **Model**: {getattr(self.options, 'model', 'claude-sonnet-4-20250514')}
 - **Working Directory**: {getattr(self.options, 'cwd', 'current')}
         """
-        self.console.print(Panel(Markdown(config_text), title="Configuration", border_style="blue"))
+        self.console.print(Panel(self._md(config_text), title="Configuration", border_style="blue"))
     
-    async def send_query(self, prompt: str) -> str:
-        """Send query to Claude and return response"""
-        response_parts = []
+    async def send_query(self, prompt: str) -> Optional[str]:
+        """Send query to Claude and return response; None if interrupted before any text arrived"""
+        # Each streamed block followed by a newline separator
+        response_buf = io.StringIO()
+        # Paragraphs that are complete are rendered once; only the trailing one is re-parsed per update
+        rendered: List[Markdown] = []
+        tail = ""
         
-        with Live(Spinner("dots", text="Claude is thinking..."), console=self.console) as live:
+        # Live's own refresh thread redraws at most 1 / LIVE_REFRESH_INTERVAL times a second,
+        # and also picks up the last update when the stream goes quiet (e.g. while tools run)
+        with Live(Spinner("dots", text="Claude is thinking..."), console=self.console,
+                  refresh_per_second=1 / LIVE_REFRESH_INTERVAL) as live:
+            def add_text(text: str) -> None:
+                nonlocal tail
+                response_buf.write(text)
+                response_buf.write('\n')
+                tail = f"{tail}\n{text}" if tail else text
+                # Split at the last blank line unless it falls inside a code fence
+                boundary = tail.rfind("\n\n")
+                if boundary != -1 and tail.count("```", 0, boundary) % 2 == 0:
+                    rendered.append(Markdown(tail[:boundary]))
+                    tail = tail[boundary + 2:]
+                # Update live display with partial response; drawn on the next scheduled refresh
+                live.update(Group(*rendered, Markdown(tail)), refresh=False)
+            
             try:
                 async for message in query(prompt=prompt, options=self.options):
                     if hasattr(message, 'content') and hasattr(message.content, '__iter__'):
                         for block in message.content:
                             if hasattr(block, 'text'):
-                                response_parts.append(block.text)
-                                # Update live display with partial response
-                                live.update(Markdown('\n'.join(response_parts)))
+                                add_text(block.text)
                     elif hasattr(message, 'result'):
-                        response_parts.append(message.result)
-                        live.update(Markdown('\n'.join(response_parts)))
+                        add_text(message.result)
             except KeyboardInterrupt:
                 live.stop()
                 self.console.print("\n[yellow]Response interrupted by user[/yellow]")
-                return '\n'.join(response_parts) if response_parts else "Interrupted"
+                # Keep whatever arrived before the interrupt, without the trailing separator
+                return response_buf.getvalue()[:-1] if response_buf.tell() else None
             except Exception as e:
                 live.stop()
                 self.console.print(f"[red]Error: {e}[/red]")
                 return f"Error: {e}"
         
-        return '\n'.join(response_parts)
+        # Drop the separator after the last block
+        return response_buf.getvalue()[:-1]
     
     def process_command(self, user_input: str) -> bool:
         """Process user commands. Returns True to continue, False to quit"""
@@ -251,7 +286,7 @@ class ClaudeTUI:
             
             if not clipboard_image:
                 self.console.print("[red]No image found in clipboard or clipboard tool not available[/red]")
-                self.console.print("[yellow]Install: xclip (Linux), pngpaste (macOS)[/yellow]")
+                self.console.print("[yellow]Install: xclip or wl-clipboard (Linux)[/yellow]")
                 return True
             
             self.console.print(f"[green]Got clipboard image: {clipboard_image}[/green]")
@@ -267,47 +302,58 @@ class ClaudeTUI:
             # It's a query for Claude
             return None  # Signal to handle as Claude query
     
-    def setup_keyboard_listener(self):
-        """Setup keyboard listener for Ctrl+Shift+V"""
-        def on_ctrl_shift_v():
-            self.clipboard_paste_pending = True
-            self.console.print("\n[yellow]📋 Clipboard paste detected! Processing image...[/yellow]")
-        
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def _md(text: str) -> Markdown:
+        """Parse markdown once per distinct text; the renderable can be printed repeatedly"""
+        return Markdown(text)
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def _response_panel(response: str) -> Panel:
+        """Panel for a Claude response, cached alongside its parsed markdown"""
+        return Panel(ClaudeTUI._md(response), border_style="blue")
+    
+    def _display_response(self, response: str) -> None:
+        """Display a Claude response rendered as markdown"""
         try:
-            keyboard.add_hotkey('ctrl+shift+v', on_ctrl_shift_v)
+            self.console.print(self._response_panel(response))
         except Exception:
-            pass  # Keyboard hooks might not work in all environments
+            # Fallback to plain text if markdown fails
+            self.console.print(Panel(response, border_style="blue"))
     
     async def run(self):
         """Main application loop"""
         self.display_banner()
-        self.setup_keyboard_listener()
+        prefill = ""
         
         while True:
             try:
-                # Check for pending clipboard paste
+                # Get user input
+                user_input, prefill = await self._read_input(prefill), ""
+                
                 if self.clipboard_paste_pending:
                     self.clipboard_paste_pending = False
+                    self.console.print("[yellow]📋 Clipboard paste detected! Processing image...[/yellow]")
                     
                     clipboard_image = self.get_clipboard_image()
                     if clipboard_image:
                         self.console.print(f"[green]✓ Got clipboard image: {clipboard_image}[/green]")
-                        follow_up = Prompt.ask("[bold green]What would you like to know about this image?[/bold green]", 
-                                             default="What do you see in this image?", console=self.console)
+                        follow_up = user_input.strip() or Prompt.ask(
+                            "[bold green]What would you like to know about this image?[/bold green]",
+                            default="What do you see in this image?", console=self.console)
                         
                         user_input = f"Analyze this image: {clipboard_image}\n\n{follow_up}"
                         
                         # Send to Claude
                         self.console.print(f"\n[bold blue]Claude[/bold blue]:")
                         response = await self.send_query(user_input)
+                        if response is None:
+                            continue
                         
                         # Display response
-                        if response and response != "Interrupted":
-                            try:
-                                markdown_response = Markdown(response)
-                                self.console.print(Panel(markdown_response, border_style="blue"))
-                            except Exception:
-                                self.console.print(Panel(response, border_style="blue"))
+                        if response:
+                            self._display_response(response)
                         
                         # Add to history
                         self.conversation_history.append(f"User: [Image] {follow_up}")
@@ -315,9 +361,9 @@ class ClaudeTUI:
                         continue
                     else:
                         self.console.print("[red]❌ No image found in clipboard[/red]")
-                
-                # Get user input
-                user_input = Prompt.ask("\n[bold green]You[/bold green]", console=self.console)
+                        # Offer what was typed again at the next prompt rather than dropping it
+                        prefill = user_input
+                        continue
                 
                 if not user_input.strip():
                     continue
@@ -338,15 +384,12 @@ class ClaudeTUI:
                     delattr(self, 'pending_query')
                 
                 response = await self.send_query(query_text)
+                if response is None:
+                    continue
                 
                 # Display response with markdown rendering
-                if response and response != "Interrupted":
-                    try:
-                        markdown_response = Markdown(response)
-                        self.console.print(Panel(markdown_response, border_style="blue"))
-                    except Exception:
-                        # Fallback to plain text if markdown fails
-                        self.console.print(Panel(response, border_style="blue"))
+                if response:
+                    self._display_response(response)
                 
                 # Add to history
                 self.conversation_history.append(f"User: {user_input}")
@@ -11,6 +11,19 @@ from pathlib import Path
 from typing import Optional, Dict, Any
 import anyio
 
+try:
+    import orjson
+
+    def _dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, indent=2).encode("utf-8")
+
+    _loads = json.loads
+
 try:
     from claude_code_sdk import query, ClaudeCodeOptions
 except ImportError:
@@ -26,8 +39,7 @@ class ClaudeWrapper:
     def load_config(self) -> Dict[str, Any]:
         """Load configuration from file"""
         try:
-            with open(self.config_path, 'r') as f:
-                return json.load(f)
+            return _loads(Path(self.config_path).read_bytes())
         except FileNotFoundError:
             return {
                 "max_turns": 10,
@@ -40,8 +52,7 @@ class ClaudeWrapper:
     
     def save_config(self):
         """Save configuration to file"""
-        with open(self.config_path, 'w') as f:
-            json.dump(self.config, f, indent=2)
+        Path(self.config_path).write_bytes(_dumps(self.config))
     
     async def query_claude(self, prompt: str, **kwargs) -> None:
         """Query Claude Code with the given prompt"""
@@ -54,8 +65,14 @@ class ClaudeWrapper:
             blocked_tools=kwargs.get('blocked_tools', self.config.get('blocked_tools'))
         )
         
+        # Let stdout buffer partial lines and flush only at line boundaries and at the end
+        write = sys.stdout.write
         async for message in query(prompt=prompt, options=options):
-            print(message, end='', flush=True)
+            text = str(message)
+            write(text)
+            if '\n' in text:
+                sys.stdout.flush()
+        sys.stdout.flush()
     
     def configure(self, **kwargs):
         """Update configuration"""
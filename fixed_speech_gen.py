@@ -3,28 +3,60 @@ import numpy as np
 import soundfile as sf
 from openai import OpenAI
 from snac import SNAC
+import asyncio
+import functools
+import hashlib
 import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Audio code formats recognized in generated text, tried in this order
+_CUSTOM_TOKEN_RE = re.compile(r'<custom_token_(\d+)>')
+_BRACKET_RE = re.compile(r'[\[\(](\d+)[\]\)]')
+_NUMBER_SEQUENCE_RE = re.compile(r'\b(\d{3,5})\b')  # 3-5 digit numbers
+
+SNAC_REPO_ID = "hubertsiuzdak/snac_24khz"
+
+# Streaming decode: frames (7 codes each) emitted per window, and frames of context decoded on either side
+STREAM_WINDOW_FRAMES = 8
+STREAM_CONTEXT_FRAMES = 2
+
+# Serializes first loads so concurrent generators don't each load the same weights
+_snac_load_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=4)
+def _load_snac(repo_id, device, dtype):
+    """Load a SNAC decoder once per process for each (repo_id, device, dtype)."""
+    print(f"Loading SNAC audio decoder on {device}...")
+    model = SNAC.from_pretrained(repo_id).to(device, dtype=dtype)
+    print("SNAC model loaded successfully!")
+    return model
 
 class SpeechGenerator:
-    def __init__(self, server_url="http://0.0.0.0:10210/v1", chosen_voice="tara"):
+    def __init__(self, server_url="http://0.0.0.0:10210/v1", chosen_voice="tara", stream=False):
         """
         Initialize the speech generator.
 
         Args:
             server_url: URL of the tokasaurus server
             chosen_voice: Voice to use for generation
+            stream: Decode audio while it is generated (see stream_speech). Off by default
+                since the tokasaurus server does not support streaming completions
         """
         self.client = OpenAI(
             api_key='fake-key',
             base_url=server_url
         )
         self.chosen_voice = chosen_voice
+        self.stream = stream
 
-        # Load SNAC model for audio decoding
-        print("Loading SNAC audio decoder...")
-        self.snac_model = SNAC.from_pretrained("hubertsiuzdak/snac_24khz")
-        self.snac_model = self.snac_model.to("cpu")
-        print("SNAC model loaded successfully!")
+        # Load SNAC model for audio decoding, on GPU in half precision when one is available
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.dtype = torch.float16 if self.device == "cuda" else torch.float32
+        with _snac_load_lock:
+            self.snac_model = _load_snac(SNAC_REPO_ID, self.device, self.dtype)
 
     def generate_speech(self, text, temperature=0.6, max_tokens=500):
         """
@@ -36,24 +68,13 @@ class SpeechGenerator:
             max_tokens: Maximum tokens to generate
 
         Returns:
-            Audio samples as numpy array
+            Audio samples as a float32 tensor on the decoder's device
         """
-        # Format prompt with voice prefix
-        prompt = f"{self.chosen_voice}: {text}"
-
         print(f"Generating speech for: '{text}'")
         print("Sending request to tokasaurus server...")
 
         try:
-            # Make request to tokasaurus server
-            response = self.client.completions.create(
-                model="default",
-                prompt=prompt,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                n=1,
-                stop=["<|endoftext|>", "\n\n", f"{self.chosen_voice}:"]  # Add stop tokens
-            )
+            response = self._request_completion(text, temperature, max_tokens)
 
             generated_text = response.choices[0].text
             print(f"Generated text: {generated_text[:200]}...")
@@ -68,6 +89,88 @@ class SpeechGenerator:
             print(f"Error during generation: {e}")
             return None
 
+    def stream_speech(self, text, temperature=0.6, max_tokens=500):
+        """
+        Generate speech from text input, yielding audio while the server is still generating.
+
+        Custom audio tokens are decoded in windows of STREAM_WINDOW_FRAMES frames as soon
+        as they arrive. Each window is decoded with STREAM_CONTEXT_FRAMES frames of context
+        on either side and cropped, so consecutive chunks join without seams. Decoding runs
+        on a worker thread so it overlaps with reading the stream. If the output contains no
+        custom tokens, the full text is parsed and decoded once at the end instead.
+
+        The overall peak is not known until generation ends, so windows are hard-clipped to
+        [-1, 1] rather than peak-normalized like save_audio does; the one-shot fallback is
+        still peak-normalized.
+
+        The server must support streaming completions; the tokasaurus server does not, and
+        rejects the request with BadRequestError.
+
+        Args:
+            text: Input text to convert to speech
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+
+        Yields:
+            Audio samples as float32 numpy arrays within [-1, 1]
+        """
+        print(f"Generating speech for: '{text}'")
+        print("Streaming request to tokasaurus server...")
+
+        stream = self._request_completion(text, temperature, max_tokens, stream=True)
+        text_parts = []
+        tail = ""  # generated text not yet scanned for complete tokens
+        codes = []
+        emitted = 0  # frames already submitted for decoding
+        pending = deque()
+
+        with ThreadPoolExecutor(max_workers=1) as decoder:
+            def submit(end):
+                nonlocal emitted
+                start = max(emitted - STREAM_CONTEXT_FRAMES, 0)
+                stop = min(end + STREAM_CONTEXT_FRAMES, len(codes) // 7)
+                pending.append(decoder.submit(
+                    self._decode_window, codes[start * 7:stop * 7], emitted - start, end - start
+                ))
+                emitted = end
+
+            for chunk in stream:
+                piece = chunk.choices[0].text
+                text_parts.append(piece)
+                # Scan up to the last complete token; a partial token stays in the tail
+                tail += piece
+                cut = tail.rfind(">") + 1
+                codes.extend(map(int, _CUSTOM_TOKEN_RE.findall(tail, 0, cut)))
+                tail = tail[cut:]
+
+                while len(codes) // 7 >= emitted + STREAM_WINDOW_FRAMES + STREAM_CONTEXT_FRAMES:
+                    submit(emitted + STREAM_WINDOW_FRAMES)
+                while pending and pending[0].done():
+                    yield pending.popleft().result()
+
+            if len(codes) // 7 > emitted:
+                submit(len(codes) // 7)
+            while pending:
+                yield pending.popleft().result()
+
+        if not codes:
+            # Not Orpheus custom tokens; fall back to the format detection in _extract_audio_codes
+            audio_samples = self._parse_and_decode_audio("".join(text_parts))
+            if audio_samples is not None and len(audio_samples) > 0:
+                yield self._normalized_numpy(audio_samples)
+
+    def _request_completion(self, text, temperature, max_tokens, stream=False):
+        """Send the voice-prefixed prompt to the tokasaurus server."""
+        return self.client.completions.create(
+            model="default",
+            prompt=f"{self.chosen_voice}: {text}",
+            temperature=temperature,
+            max_tokens=max_tokens,
+            n=1,
+            stop=["<|endoftext|>", "\n\n", f"{self.chosen_voice}:"],  # Add stop tokens
+            stream=stream
+        )
+
     def _parse_and_decode_audio(self, generated_text):
         """
         Parse generated text and decode audio codes.
@@ -97,39 +200,24 @@ class SpeechGenerator:
         Extract audio codes from generated text.
         Orpheus typically outputs codes in specific token formats.
         """
-        codes = []
-        
         # Method 1: Look for custom tokens like <custom_token_XXXX>
-        custom_token_pattern = r'<custom_token_(\d+)>'
-        custom_matches = re.findall(custom_token_pattern, text)
+        custom_matches = _CUSTOM_TOKEN_RE.findall(text)
         if custom_matches:
             print(f"Found {len(custom_matches)} custom tokens")
-            codes = [int(match) for match in custom_matches]
-            return codes
+            return list(map(int, custom_matches))
         
         # Method 2: Look for patterns like [XXXX] or (XXXX)
-        bracket_pattern = r'[\[\(](\d+)[\]\)]'
-        bracket_matches = re.findall(bracket_pattern, text)
+        bracket_matches = _BRACKET_RE.findall(text)
         if bracket_matches:
             print(f"Found {len(bracket_matches)} bracketed numbers")
-            codes = [int(match) for match in bracket_matches]
-            return codes
+            return list(map(int, bracket_matches))
         
-        # Method 3: Look for sequences of numbers separated by spaces/commas
-        number_sequence_pattern = r'\b(\d{3,5})\b'  # 3-5 digit numbers
-        number_matches = re.findall(number_sequence_pattern, text)
+        # Method 3: Look for sequences of numbers separated by spaces/commas.
+        # This also covers bare 4-digit numbers, so no separate scan is needed for them.
+        number_matches = _NUMBER_SEQUENCE_RE.findall(text)
         if number_matches:
             print(f"Found {len(number_matches)} number sequences")
-            codes = [int(match) for match in number_matches]
-            return codes
-        
-        # Method 4: Look for any 4-digit numbers (typical for audio codes)
-        four_digit_pattern = r'\b(\d{4})\b'
-        four_digit_matches = re.findall(four_digit_pattern, text)
-        if four_digit_matches:
-            print(f"Found {len(four_digit_matches)} four-digit numbers")
-            codes = [int(match) for match in four_digit_matches]
-            return codes
+            return list(map(int, number_matches))
 
         print("No recognizable audio code patterns found")
         return []
@@ -145,63 +233,156 @@ class SpeechGenerator:
             
         # Ensure we have a multiple of 7 codes
         new_length = (len(code_list) // 7) * 7
-        code_list = code_list[:new_length]
         print(f"Using {new_length} codes (from {len(code_list)} total)")
 
-        # Redistribute codes into 3 layers based on SNAC format
-        layer_1 = []
-        layer_2 = []
-        layer_3 = []
-
-        for i in range(new_length // 7):
-            base_idx = 7 * i
-            layer_1.append(code_list[base_idx])
-            layer_2.extend([code_list[base_idx + 1], code_list[base_idx + 4]])
-            layer_3.extend([
-                code_list[base_idx + 2], 
-                code_list[base_idx + 3],
-                code_list[base_idx + 5], 
-                code_list[base_idx + 6]
-            ])
-
-        # Convert to tensors and ensure valid ranges
+        # Convert to tensors and decode
         try:
-            # Clamp values to valid SNAC ranges
-            layer_1 = torch.clamp(torch.tensor(layer_1, dtype=torch.long), 0, 4095)
-            layer_2 = torch.clamp(torch.tensor(layer_2, dtype=torch.long), 0, 4095)
-            layer_3 = torch.clamp(torch.tensor(layer_3, dtype=torch.long), 0, 4095)
-            
-            codes = [
-                layer_1.unsqueeze(0),
-                layer_2.unsqueeze(0), 
-                layer_3.unsqueeze(0)
-            ]
-
-            print(f"Layer shapes: {[c.shape for c in codes]}")
-
-            # Decode audio
-            with torch.no_grad():
-                audio_hat = self.snac_model.decode(codes)
+            num_frames = new_length // 7
+            print(f"Layer shapes: {[(1, num_frames), (1, 2 * num_frames), (1, 4 * num_frames)]}")
 
-            return audio_hat.squeeze().numpy()
+            # Stay on the decoder's device; save_audio copies to the host once after normalizing
+            return self._decode_frames(code_list[:new_length])
             
         except Exception as e:
             print(f"Error during SNAC decoding: {e}")
             return None
 
+    def _decode_frames(self, code_list):
+        """Decode codes (a multiple of 7 long) with SNAC into a float32 tensor on the decoder's device."""
+        # Redistribute codes into 3 layers based on SNAC format: each 7-code frame holds
+        # 1 layer-1 code (slot 0), 2 layer-2 codes (slots 1, 4) and 4 layer-3 codes (slots 2, 3, 5, 6)
+        frames = np.asarray(code_list, dtype=np.int64).reshape(-1, 7)
+        # Clamp values to valid SNAC ranges in one pass over all frames; out-of-range codes are
+        # clamped rather than dropped, since dropping would shift every following frame
+        np.clip(frames, 0, 4095, out=frames)
+        layer_1 = np.ascontiguousarray(frames[:, 0])
+        layer_2 = frames[:, [1, 4]].reshape(-1)
+        layer_3 = frames[:, [2, 3, 5, 6]].reshape(-1)
+
+        codes = [
+            torch.from_numpy(layer).unsqueeze_(0).to(self.device, non_blocking=True)
+            for layer in (layer_1, layer_2, layer_3)
+        ]
+        with torch.inference_mode():
+            audio_hat = self.snac_model.decode(codes)
+        return audio_hat.squeeze().float()
+
+    def _decode_window(self, code_list, keep_start, keep_stop):
+        """Decode a window of frames and keep only frames [keep_start, keep_stop) as clipped numpy audio."""
+        samples_per_frame = int(self.snac_model.hop_length) * self.snac_model.vq_strides[0]
+        audio = self._decode_frames(code_list)[keep_start * samples_per_frame:keep_stop * samples_per_frame]
+        return audio.clamp(-1.0, 1.0).cpu().numpy()
+
     def save_audio(self, audio_samples, filename="output.wav", sample_rate=24000):
-        """Save audio samples to file."""
+        """
+        Save audio samples to file.
+
+        Samples may be a tensor on any device or a numpy array, and are
+        normalized in place if they would clip.
+        """
         if audio_samples is not None and len(audio_samples) > 0:
-            # Normalize audio to prevent clipping
-            if np.max(np.abs(audio_samples)) > 1.0:
-                audio_samples = audio_samples / np.max(np.abs(audio_samples)) * 0.95
-                
-            sf.write(filename, audio_samples, sample_rate)
+            sf.write(filename, self._normalized_numpy(audio_samples), sample_rate)
             print(f"Audio saved to {filename}")
             return filename
         return None
 
-def main():
+    @staticmethod
+    def _normalized_numpy(audio_samples):
+        """Scale samples in place to a 0.95 peak if they would clip, and return them as a numpy array."""
+        # Normalize audio to prevent clipping; max/min avoid allocating an abs() copy
+        if isinstance(audio_samples, torch.Tensor):
+            with torch.inference_mode():
+                low, high = torch.aminmax(audio_samples)
+                peak = max(high.item(), -low.item())
+                if peak > 1.0:
+                    audio_samples.mul_(0.95 / peak)
+            return audio_samples.cpu().numpy()
+        peak = max(audio_samples.max(), -audio_samples.min())
+        if peak > 1.0:
+            np.multiply(audio_samples, 0.95 / peak, out=audio_samples)
+        return audio_samples
+
+    def synthesize_to_file(self, text, filename):
+        """
+        Generate speech for text into filename, streaming if the generator was created with stream=True.
+
+        Returns the filename, or None if no audio was produced.
+        """
+        if self.stream:
+            # Audio is written to the file as soon as it is decoded
+            return self.save_audio_stream(self.stream_speech(text), filename)
+        return self.save_audio(self.generate_speech(text), filename)
+
+    def save_audio_stream(self, chunks, filename="output.wav", sample_rate=24000):
+        """
+        Write audio chunks to file as they are produced.
+
+        The file is only created once the first chunk arrives. Returns the
+        filename, or None if no audio was produced.
+        """
+        out = None
+        try:
+            for chunk in chunks:
+                if out is None:
+                    out = sf.SoundFile(filename, "w", samplerate=sample_rate, channels=1)
+                out.write(chunk)
+        finally:
+            if out is not None:
+                out.close()
+
+        if out is None:
+            return None
+        print(f"Audio saved to {filename}")
+        return filename
+
+def _synthesize(generator, text):
+    """Generate speech for one prompt and write it to its own file."""
+    # A short stable digest of the text; hash() % 10000 collided after a few hundred prompts
+    filename = f"speech_{hashlib.blake2b(text.encode('utf-8'), digest_size=4).hexdigest()}.wav"
+    if generator.synthesize_to_file(text, filename):
+        print("Audio generation successful!")
+    else:
+        print("Failed to generate speech")
+
+async def _in_daemon_thread(func, *args):
+    """
+    Run func(*args) on a daemon thread and await its result.
+
+    Unlike asyncio.to_thread, an interrupt does not wait for the call to return:
+    asyncio.run would otherwise block on a pending input() until Enter is pressed.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def settle(method, value):
+        if not future.done():
+            method(value)
+
+    def run():
+        try:
+            outcome = (future.set_result, func(*args))
+        except BaseException as e:
+            outcome = (future.set_exception, e)
+        try:
+            loop.call_soon_threadsafe(settle, *outcome)
+        except RuntimeError:
+            pass  # The loop already closed after an interrupt; nobody is waiting
+
+    threading.Thread(target=run, daemon=True).start()
+    return await future
+
+async def _synthesis_worker(generator, queue):
+    """Synthesize queued prompts in order, off the event loop so input stays responsive."""
+    while True:
+        text = await queue.get()
+        try:
+            await _in_daemon_thread(_synthesize, generator, text)
+        except Exception as e:
+            print(f"Error: {e}")
+        finally:
+            queue.task_done()
+
+async def main():
     """Interactive speech generation."""
     print("Initializing Speech Generator...")
     print("Make sure tokasaurus server is running with:")
@@ -209,10 +390,15 @@ def main():
     print()
 
     generator = SpeechGenerator()
-
-    while True:
-        try:
-            text = input("\nEnter text to convert to speech (or 'quit' to exit): ")
+    queue = asyncio.Queue()
+    worker = asyncio.create_task(_synthesis_worker(generator, queue))
+
+    try:
+        while True:
+            try:
+                text = await _in_daemon_thread(input, "\nEnter text to convert to speech (or 'quit' to exit): ")
+            except EOFError:
+                break
 
             if text.lower() in ['quit', 'exit', 'q']:
                 break
@@ -221,22 +407,16 @@ def main():
                 print("Please enter some text!")
                 continue
 
-            # Generate speech
-            audio = generator.generate_speech(text)
+            # The next prompt can be typed while this one is still generating
+            queue.put_nowait(text)
 
-            if audio is not None:
-                # Save audio file
-                filename = f"speech_{hash(text) % 10000}.wav"
-                generator.save_audio(audio, filename)
-                print("Audio generation successful!")
-            else:
-                print("Failed to generate speech")
-
-        except KeyboardInterrupt:
-            print("\nExiting...")
-            break
-        except Exception as e:
-            print(f"Error: {e}")
+        # Let prompts that are already queued finish before exiting
+        await queue.join()
+    finally:
+        worker.cancel()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nExiting...")
@@ -1,72 +1,136 @@
 #!/usr/bin/env python3
 """Simple Claude Code SDK Test Tool"""
 
+import asyncio
+import functools
+import os
 import sys
+import threading
+import traceback
+from importlib.util import find_spec
 
-# Test if claude-code-sdk is available
-try:
-    import anyio
-    print("✓ anyio available")
-except ImportError:
-    print("✗ anyio not found - install with: pip install anyio")
-    sys.exit(1)
-
-try:
-    from claude_code_sdk import query, ClaudeCodeOptions
-    print("✓ claude-code-sdk available")
-except ImportError:
+# Test if claude-code-sdk is available without importing it; the import itself runs in _preload_sdk
+if find_spec("claude_code_sdk") is None:
     print("✗ claude-code-sdk not found - install with: pip install claude-code-sdk")
     sys.exit(1)
+if os.environ.get("SIMPLE_CLAUDE_VERBOSE"):
+    print("✓ claude-code-sdk available")
 
-async def test_basic_query():
-    """Test basic Claude query"""
-    print("\n--- Testing Basic Query ---")
-    
+_sdk = None
+_sdk_ready = threading.Event()
+_preload_started = False
+
+def _preload_sdk():
+    """Import claude_code_sdk in the background while the banner prints and the event loop starts"""
+    global _sdk
     try:
-        options = ClaudeCodeOptions(max_turns=1)
-        async for message in query(
-            prompt="Say hello and tell me the current time", 
-            options=options
-        ):
-            if hasattr(message, 'content') and hasattr(message.content, '__iter__'):
-                for block in message.content:
-                    if hasattr(block, 'text'):
-                        print(block.text, end='')
-            elif hasattr(message, 'result'):
-                print(message.result, end='')
-        print("\n✓ Basic query successful")
-    except Exception as e:
-        print(f"✗ Basic query failed: {e}")
+        import claude_code_sdk
+        _sdk = claude_code_sdk
+    finally:
+        _sdk_ready.set()
+
+def _start_preload():
+    """Start the background import of claude_code_sdk, once"""
+    global _preload_started
+    if not _preload_started:
+        _preload_started = True
+        threading.Thread(target=_preload_sdk, daemon=True).start()
 
-async def test_code_query():
-    """Test code-related query"""
-    print("\n--- Testing Code Query ---")
+async def _load_sdk():
+    """Return claude_code_sdk once the background import has finished"""
+    global _sdk
+    # Importing this module costs nothing until a query runs, unless it is run as a script
+    _start_preload()
+    # Poll rather than block on the Event, so the event loop (and the query timeout) keeps running
+    while not _sdk_ready.is_set():
+        await asyncio.sleep(0.01)
+    if _sdk is None:
+        # The background import failed; importing again raises its error here
+        import claude_code_sdk
+        _sdk = claude_code_sdk
+    return _sdk
+
+def _query_errors() -> tuple:
+    """Exceptions reported as an ordinary failed test; anything else is reported with its traceback"""
+    if _sdk is None:
+        # The SDK did not import, so that ImportError is the only failure a query can have
+        return (ImportError,)
+    return (ImportError, ConnectionError, _sdk.ClaudeSDKError)
+
+@functools.lru_cache(maxsize=None)
+def _options(max_turns: int):
+    """Build the ClaudeCodeOptions for a turn limit once, after _load_sdk; query() does not mutate its options"""
+    return _sdk.ClaudeCodeOptions(max_turns=max_turns)
+
+# Seconds a single query may take before it is reported as timed out
+QUERY_TIMEOUT = 30
+# Queries allowed to run at once, to stay within the SDK's concurrent session limits
+MAX_CONCURRENT_QUERIES = 4
+_query_slots = asyncio.Semaphore(MAX_CONCURRENT_QUERIES)
+
+# (label, prompt, max_turns) for each query test
+_CASES = (
+    ("Basic query", "Say hello and tell me the current time", 1),
+    ("Code query", "Write a simple Python function that adds two numbers", 2),
+)
+
+async def _stream_text(prompt: str, max_turns: int, write) -> None:
+    """Run one query, writing the text of every streamed message"""
+    sdk = await _load_sdk()
+    async for message in sdk.query(prompt=prompt, options=_options(max_turns)):
+        content = getattr(message, 'content', None)
+        if content is not None:
+            # Content is nearly always a list of blocks; only other types need the iterability probe
+            t = type(content)
+            if t is not list and t is not tuple and not hasattr(content, '__iter__'):
+                continue
+            for block in content:
+                text = getattr(block, 'text', None)
+                if text is not None:
+                    write(text)
+            continue
+        result = getattr(message, 'result', None)
+        if result is not None:
+            write(result)
+
+async def _run_case(label: str, prompt: str, max_turns: int) -> str:
+    """Run one query and test it, returning its output"""
+    # Output is collected as parts and joined once at the end
+    parts = [f"\n--- Testing {label.title()} ---\n"]
+    append = parts.append
     
     try:
-        options = ClaudeCodeOptions(max_turns=2)
-        async for message in query(
-            prompt="Write a simple Python function that adds two numbers", 
-            options=options
-        ):
-            if hasattr(message, 'content') and hasattr(message.content, '__iter__'):
-                for block in message.content:
-                    if hasattr(block, 'text'):
-                        print(block.text, end='')
-            elif hasattr(message, 'result'):
-                print(message.result, end='')
-        print("\n✓ Code query successful")
-    except Exception as e:
-        print(f"✗ Code query failed: {e}")
+        async with _query_slots:
+            await asyncio.wait_for(_stream_text(prompt, max_turns, append), QUERY_TIMEOUT)
+        append(f"\n✓ {label} successful\n")
+    except asyncio.TimeoutError:
+        append(f"\n✗ {label} timed out after {QUERY_TIMEOUT}s\n")
+    except _query_errors() as e:
+        append(f"✗ {label} failed: {e}\n")
+    except Exception:
+        # Not an expected query failure; keep the traceback but still report the other cases
+        append(f"✗ {label} failed unexpectedly:\n{traceback.format_exc()}")
+    return "".join(parts)
 
 async def main():
     print("Claude Code SDK Test Tool")
     print("=" * 30)
     
-    await test_basic_query()
-    await test_code_query()
+    # All cases run concurrently; their buffered output is printed in order afterwards
+    sys.stdout.write("".join(await asyncio.gather(*(_run_case(*case) for case in _CASES))))
+    sys.stdout.flush()
     
     print("\n" + "=" * 30)
     print("Test complete!")
 
 if __name__ == "__main__":
-    anyio.run(main)
\ No newline at end of file
+    _start_preload()
+    # uvloop is optional; when installed it replaces the default asyncio event loop.
+    # The runner is only chosen inside the try so errors from main() don't chain onto the ImportError
+    try:
+        import uvloop
+        # uvloop.run only exists from uvloop 0.18; older releases just use the default loop
+        run = getattr(uvloop, "run", None) or asyncio.run
+    except ImportError:
+        run = asyncio.run
+    run(main())